@@ -1,4 +1,6 @@
+import functools
 import math
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from dash import Dash
@@ -7,18 +9,28 @@ import dash_html_components as html
 from dash.dependencies import Input, Output
 import plotly.express as px
 
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional: the solver kernel below is plain NumPy and runs
+    # unchanged without it, just without native-code compilation.
+    njit = None
 
-class ScrapeParameters:
-    rp_wr = 0
-    rp_wb = 0
-    rp_a = 0
-    rp_cd = 0
-    rp_dtl = 0
 
-    ep_crr = 0
-    ep_rho = 0
-    ep_headwind = 0
-    ep_g = 0
+# sin/cos of the slope angle, cached: users sweep power and weight far
+# more often than grade, so repeated callbacks hit the same entry.
+@functools.lru_cache(maxsize=256)
+def _grade_trig(hill_grade):
+    theta = math.atan(hill_grade / 100.0)
+    return math.sin(theta), math.cos(theta)
+
+
+class ScrapeParameters:
+    # __slots__ turns every attribute read in the hot path into a fixed
+    # offset instead of a per-instance __dict__ lookup.
+    __slots__ = ('rp_wr', 'rp_wb', 'rp_a', 'rp_cd', 'rp_dtl',
+                 'ep_crr', 'ep_rho', 'ep_headwind', 'ep_g',
+                 '_w_total_g', '_f_grav', '_f_roll_mag', '_drag_k')
 
     def __init__(self,
                  rider_weight,
@@ -41,39 +53,44 @@ class ScrapeParameters:
         self.ep_rho = air_density
         self.ep_headwind = headwind
 
-
+        # Hoisted solver invariants: these depend only on the inputs
+        # above, never on velocity, so compute them once per parameter
+        # set instead of once per force evaluation.
+        sin_theta, cos_theta = _grade_trig(hill_grade)
+        self._w_total_g = 9.8067 * (rider_weight + bike_weight)
+        self._f_grav = self._w_total_g * sin_theta
+        self._f_roll_mag = self._w_total_g * cos_theta * \
+            rolling_resistance_coefficient
+        self._drag_k = 0.5 * frontal_area * drag_coefficient * \
+            air_density / (3.6 ** 2)
+
+    def as_tuple(self):
+        # The constructor arguments in positional order, usable both as
+        # a hashable cache key and to rebuild an equal instance.
+        return (self.rp_wr, self.rp_wb, self.rp_a, self.rp_cd,
+                self.ep_g, self.ep_headwind, self.ep_rho,
+                self.rp_dtl, self.ep_crr)
+
+
+# velocity may be a scalar or a NumPy array; everything below is
+# ufunc-friendly so a whole power sweep evaluates in one pass.
 def calculate_forces(velocity, params):
-    f_gravity = 9.8067 * \
-                (params.rp_wr + params.rp_wb) * \
-                math.sin(math.atan(params.ep_g / 100.0))
-
-    f_rolling = 9.8067 * \
-                (params.rp_wr + params.rp_wb) * \
-                math.cos(math.atan(params.ep_g / 100.0)) * \
-                params.ep_crr
+    f_gravity = params._f_grav
 
-    if velocity < 0:
-        f_rolling *= -1.0
+    f_rolling = params._f_roll_mag * np.copysign(1.0, velocity)
 
-    f_drag = 0.5 * \
-             params.rp_a * \
-             params.rp_cd * \
-             params.ep_rho * \
-             ((velocity + params.ep_headwind) * 1000.0 / 3600.0) * \
-             ((velocity + params.ep_headwind) * 1000.0 / 3600.0)
+    # air_speed * abs(air_speed) squares the magnitude while keeping the
+    # sign, so no separate sign flip is needed.
+    air_speed = velocity + params.ep_headwind
+    f_drag = params._drag_k * air_speed * np.abs(air_speed)
 
-    if velocity + params.ep_headwind < 0:
-        f_drag *= -1.0
-
-    return {'f_gravity': f_gravity,
-            'f_rolling': f_rolling,
-            'f_drag': f_drag}
+    return f_gravity, f_rolling, f_drag
 
 
 def calculate_power(velocity, params):
     # calculate the forces on the rider.
-    forces = calculate_forces(velocity, params)
-    total_force = forces['f_gravity'] + forces['f_rolling'] + forces['f_drag']
+    f_gravity, f_rolling, f_drag = calculate_forces(velocity, params)
+    total_force = f_gravity + f_rolling + f_drag
 
     # calculate necessary wheelpower.
     wheel_power = total_force * (velocity * 1000.0 / 3600.0)
@@ -81,68 +98,264 @@ def calculate_power(velocity, params):
     # calculate necessary legpower. Note: if wheelpower is negative,
     # i.e., braking is needed instead of pedaling, then there is
     # no drivetrain loss.
-    drive_train_frac = 1.0
-    if wheel_power > 0.0:
-        drive_train_frac = drive_train_frac - (params.rp_dtl / 100.0)
+    drive_train_frac = 1.0 - (params.rp_dtl / 100.0) * (wheel_power > 0.0)
 
-    leg_power = wheel_power / drive_train_frac
+    leg_power_raw = wheel_power / drive_train_frac
 
-    if leg_power > 0.0:
-        leg_power = leg_power
-        wheel_power = wheel_power
-        drive_train_loss = leg_power - wheel_power
-        braking_power = 0.0
-    else:
-        leg_power = 0.0
-        wheel_power = 0.0
-        drive_train_loss = 0.0
-        braking_power = leg_power * -1.0
+    leg_power = np.maximum(leg_power_raw, 0.0)
+    braking_power = np.maximum(leg_power_raw * -1.0, 0.0)
+    wheel_power = np.maximum(wheel_power, 0.0)
+    drive_train_loss = leg_power - wheel_power
 
-    return {'leg_power': leg_power,
-            'wheel_power': wheel_power,
-            'drive_train_loss': drive_train_loss,
-            'braking_power': braking_power}
+    return leg_power, wheel_power, drive_train_loss, braking_power
 
 
-def calculate_velocity(power, params):
-    # How close to get before finishing.
-    epsilon = 0.000001
+# Returns the signed legpower (negative for brakepower); exactly one of
+# leg_power/braking_power is nonzero, so the subtraction picks the right
+# branch without allocating the full result.
+def _calculate_leg_power_only(velocity, params):
+    leg_power, _, _, braking_power = calculate_power(velocity, params)
+    return leg_power - braking_power
 
-    # Set some reasonable upper / lower starting points.
-    lower_vel = -1000.0
-    upper_vel = 1000.0
-    mid_vel = 0.0
-    mid_pow_dict = calculate_power(mid_vel, params)
 
-    # Iterate until completion.
+def calculate_velocity(power, params):
+    # For a pedaling rider the power balance is a cubic in velocity and
+    # has a closed-form root; only odd cases (braking targets, air speed
+    # changing sign below the solution) still need the iterative solver.
+    if power > 0.0:
+        velocity = solve_velocity_cubic(power, params)
+        if velocity is not None:
+            return velocity
+    return bisect_velocity(power, params)
+
+
+def solve_velocity_cubic(power, params):
+    # Expand leg_power * drive_train_frac =
+    #     (f_gravity + f_rolling + 0.5*a*cd*rho*((v+w)/3.6)^2) * v/3.6
+    # into A*v^3 + B*v^2 + C*v + D = 0, assuming v > 0 and v + w > 0.
+    # Returns None when no root satisfies those assumptions.
+    headwind = params.ep_headwind
+
+    a_coeff = params._drag_k / 3.6
+    b_coeff = 2.0 * headwind * a_coeff
+    c_coeff = headwind * headwind * a_coeff + \
+        (params._f_grav + params._f_roll_mag) / 3.6
+    d_coeff = -power * (1.0 - params.rp_dtl / 100.0)
+
+    for root in np.roots([a_coeff, b_coeff, c_coeff, d_coeff]):
+        if abs(root.imag) > 1e-9:
+            continue
+        velocity = root.real
+        if velocity <= 0.0 or velocity + headwind <= 0.0:
+            continue
+        # Confirm against the full model before trusting the branch
+        # assumptions baked into the cubic.
+        leg_power = _calculate_leg_power_only(velocity, params)
+        if abs(leg_power - power) < 0.000001:
+            return velocity
+    return None
+
+
+def bisect_velocity(power, params):
+    # Bracket from physics instead of +/-1000 km/h: a positive target
+    # power means a forward-moving rider, and the zero-drag estimate
+    # power / (f_gravity + f_rolling) puts the first probe near the
+    # root instead of at 0.
+    if power >= 0.0:
+        lower_vel = 0.0
+        upper_vel = 150.0
+        # Grow the cap in the rare case the root lies beyond it
+        # (extreme descents).
+        while _calculate_leg_power_only(upper_vel, params) < power:
+            upper_vel *= 2.0
+        mid_vel = min(max(1.0, power * 3.6 /
+                          (params._f_grav + params._f_roll_mag + 1e-6)),
+                      upper_vel)
+    else:
+        lower_vel = -1000.0
+        upper_vel = 1000.0
+        mid_vel = 0.0
+    mid_pow = _calculate_leg_power_only(mid_vel, params)
+
+    # Halve the bracket until it is narrower than 1e-4 km/h, far below
+    # the 2-decimal display precision. Testing the bracket width rather
+    # than the power residual needs no extra power evaluation, and the
+    # old 1e-6 W residual target burned ~10 extra halvings on precision
+    # nobody could see.
     it_count = 0
-    while True:
-        mid_pow = pow_dict_to_leg_power(mid_pow_dict)
-        if abs(mid_pow - power) < epsilon:
-            break
-
+    while upper_vel - lower_vel > 0.0001:
         if mid_pow > power:
             upper_vel = mid_vel
         else:
             lower_vel = mid_vel
 
         mid_vel = (upper_vel + lower_vel) / 2.0
-        mid_pow_dict = calculate_power(mid_vel, params)
+        mid_pow = _calculate_leg_power_only(mid_vel, params)
         it_count += 1
-        if it_count > 100:
+        if it_count > 40:
             break
 
     return mid_vel
 
 
-# Returns the legpower (negative for brakepower) from the powerdict.
-def pow_dict_to_leg_power(pow_dict):
-    mid_pow = 0.0
-    if pow_dict['braking_power'] > 0.0:
-        mid_pow = pow_dict['braking_power'] * -1.0
-    else:
-        mid_pow = pow_dict['leg_power']
-    return mid_pow
+def calculate_velocities(powers, params):
+    # Vectorized counterpart of calculate_velocity: one bisection over
+    # arrays instead of one bisection per power value. Each iteration
+    # halves every bracket at once, so ~40 iterations pin all velocities
+    # down to well below display precision.
+    #
+    # On climbs, powers too small to hold even 1 km/h produce tiny or
+    # negative speeds with meaningless durations; mark those NaN up
+    # front and keep them out of the bisection entirely.
+    drive_train_frac = 1.0 - params.rp_dtl / 100.0
+    power_min = (params._f_grav + params._f_roll_mag) * \
+        (1.0 / 3.6) / drive_train_frac
+    feasible = powers >= power_min
+
+    if np.all(feasible):
+        return _solve_velocities_kernel(powers,
+                                        params._f_grav,
+                                        params._f_roll_mag,
+                                        params._drag_k,
+                                        params.ep_headwind,
+                                        params.rp_dtl)
+
+    velocities = np.full_like(powers, np.nan)
+    velocities[feasible] = _solve_velocities_kernel(powers[feasible],
+                                                    params._f_grav,
+                                                    params._f_roll_mag,
+                                                    params._drag_k,
+                                                    params.ep_headwind,
+                                                    params.rp_dtl)
+    return velocities
+
+
+def _leg_power_kernel(velocity, f_grav, f_roll_mag, drag_k, headwind,
+                      drive_train_loss):
+    # The physics of calculate_forces/calculate_power on primitives only
+    # (no params object, no dicts), so numba can compile it to native
+    # code when it is installed. Returns the signed leg power.
+    air_speed = velocity + headwind
+    total_force = f_grav + \
+        f_roll_mag * np.copysign(1.0, velocity) + \
+        drag_k * air_speed * np.abs(air_speed)
+    wheel_power = total_force * velocity / 3.6
+    drive_train_frac = np.where(wheel_power > 0.0,
+                                1.0 - drive_train_loss / 100.0,
+                                1.0)
+    return wheel_power / drive_train_frac
+
+
+def _solve_velocities_kernel(powers, f_grav, f_roll_mag, drag_k, headwind,
+                             drive_train_loss):
+    # Physics-informed bracket: positive target powers mean a
+    # forward-moving rider, so [0, 150] km/h covers realistic roots;
+    # fall back to the wide +/-1000 bracket where the power curve (or a
+    # negative target) says otherwise.
+    lower_vel = np.where(powers >= 0.0, 0.0, -1000.0)
+    upper_vel = np.where(powers >= 0.0, 150.0, 1000.0)
+    upper_pow = _leg_power_kernel(upper_vel, f_grav, f_roll_mag, drag_k,
+                                  headwind, drive_train_loss)
+    upper_vel = np.where(upper_pow < powers, 1000.0, upper_vel)
+    mid_vel = (lower_vel + upper_vel) / 2.0
+
+    for _ in range(40):
+        mid_vel = (lower_vel + upper_vel) / 2.0
+        mid_pow = _leg_power_kernel(mid_vel, f_grav, f_roll_mag, drag_k,
+                                    headwind, drive_train_loss)
+        too_fast = mid_pow > powers
+        upper_vel = np.where(too_fast, mid_vel, upper_vel)
+        lower_vel = np.where(too_fast, lower_vel, mid_vel)
+        # Stop once every bracket is narrower than display precision.
+        if np.max(upper_vel - lower_vel) < 0.0001:
+            break
+
+    return mid_vel
+
+
+if njit is not None:
+    _leg_power_kernel = njit(cache=True, fastmath=True)(_leg_power_kernel)
+    _solve_velocities_kernel = njit(cache=True, fastmath=True)(
+        _solve_velocities_kernel)
+
+
+@functools.lru_cache(maxsize=128)
+def _cached_speed_sweep(power_lo, power_hi, params_key):
+    # Dash re-invokes the callback with unchanged inputs on re-renders,
+    # and users flip back and forth between values; keying the solved
+    # sweep on the numeric inputs collapses those calls to a dict
+    # lookup. The returned arrays are treated as read-only by callers.
+    powers = np.arange(power_lo, power_hi, dtype=np.float64)
+    speeds = calculate_velocities(powers, ScrapeParameters(*params_key))
+    return powers, speeds
+
+
+# Power-zone boundaries as fractions of FTP, and the label/color of the
+# band between each pair of neighboring edges.
+_ZONE_FRACTIONS = (0.56, 0.75, 0.9, 1.05, 1.2)
+_ZONES = (("Zone 2", "blue"),
+          ("Zone 3", "green"),
+          ("Zone 4", "orange"),
+          ("Zone 5", "red"))
+
+
+def _build_base_layout():
+    # Everything in here is static across callbacks. Build the layout
+    # once at import time; update_graph constructs a figure from fresh
+    # trace data plus this layout and only adds the zone rectangles.
+    return go.Layout(
+        title_text="Race Performance Calculator",
+        width=1000,
+        height=800,
+        showlegend=True,
+        hovermode='x unified',
+        spikedistance=-1,
+        xaxis=dict(
+            title="Power(w)",
+            showspikes=True,
+            spikemode='across',
+            spikesnap='cursor',
+            showline=True,
+            showgrid=True,
+        ),
+        yaxis=dict(
+            title="Speed(km/h)",
+            titlefont=dict(
+                color="#1f77b4"
+            ),
+            tickfont=dict(
+                color="#1f77b4"
+            ),
+        ),
+        yaxis2=dict(
+            title="Duration(h)",
+            titlefont=dict(
+                color="#ff7f0e"
+            ),
+            tickfont=dict(
+                color="#ff7f0e"
+            ),
+            anchor="free",
+            overlaying="y",
+            side="left",
+            position=0.1
+        ),
+        yaxis3=dict(
+            title="TSS",
+            titlefont=dict(
+                color="#d62728"
+            ),
+            tickfont=dict(
+                color="#d62728"
+            ),
+            anchor="x",
+            overlaying="y",
+            side="right"
+        )
+    )
+
+
+_BASE_LAYOUT = _build_base_layout()
 
 
 app = Dash(__name__)
@@ -151,35 +364,35 @@ app.layout = html.Div([
     html.H1("Race Performance Calculator"),
     html.Div([
         "FTP(w): ",
-        dcc.Input(id='ftp', value=300.0, type='number'),
+        dcc.Input(id='ftp', value=300.0, type='number', debounce=True),
         "Race Distance(km): ",
-        dcc.Input(id='race_distance', value=180.0, type='number')
+        dcc.Input(id='race_distance', value=180.0, type='number', debounce=True)
     ]),
     html.Br(),
     html.Div([
         "Rider Weight(kg): ",
-        dcc.Input(id='rider_weight', value=75.0, type='number'),
+        dcc.Input(id='rider_weight', value=75.0, type='number', debounce=True),
         "Bike Weight(kg): ",
-        dcc.Input(id='bike_weight', value=10.0, type='number')
+        dcc.Input(id='bike_weight', value=10.0, type='number', debounce=True)
     ]),
     html.Br(),
     html.Div([
         "Frontal Area(m^2): ",
-        dcc.Input(id='frontal_area', value=0.5, type='number'),
+        dcc.Input(id='frontal_area', value=0.5, type='number', debounce=True),
         "Drag Coefficient: ",
-        dcc.Input(id='drag_coefficient', value=0.51, type='number')
+        dcc.Input(id='drag_coefficient', value=0.51, type='number', debounce=True)
     ]),
     html.Br(),
     html.Div([
         "Hill Grade(%): ",
-        dcc.Input(id='hill_grade', value=0.0, type='number'),
+        dcc.Input(id='hill_grade', value=0.0, type='number', debounce=True),
         "Headwind(m/s): ",
-        dcc.Input(id='headwind', value=0.0, type='number')
+        dcc.Input(id='headwind', value=0.0, type='number', debounce=True)
     ]),
     html.Br(),
     html.Div([
         "Air Density(kg/m^3): ",
-        dcc.Input(id='air_density', value=1.22, type='number')
+        dcc.Input(id='air_density', value=1.22, type='number', debounce=True)
     ]),
     dcc.Graph(id='graph'),
 ])
@@ -208,119 +421,70 @@ def update_graph(ftp, race_distance,
                               headwind=headwind,
                               air_density=air_density)
 
-    powers = []
-    speeds = []
-    tss = []
-    durations = []
-    duration_texts = []
-    for power in range(math.ceil(0.4 * ftp), math.ceil(1.3 * ftp)):
-        speed = calculate_velocity(power, params)
-        if_value = power / ftp * 1.0
-        duration = race_distance / speed
-
-        powers.append(power)
-        speeds.append(speed)
-        durations.append(duration)
-        duration_texts.append(
-            str(math.floor(duration)) + ':' + str(math.floor((duration - math.floor(duration)) * 60)) + ':' + str(
-                math.floor((((duration - math.floor(duration)) * 60) - math.floor(
-                    (duration - math.floor(duration)) * 60)) * 60)))
-        tss.append(if_value ** 2 * duration * 100)
-
-    fig = go.Figure()
-
-    fig.add_trace(go.Scatter(
-        x=powers,
-        y=speeds,
-        name="Speed",
-        hovertemplate='%{y:.2f} km/h'
-    ))
-
-    fig.add_trace(go.Scatter(
-        x=powers,
-        y=durations,
-        name="Duration",
-        yaxis="y2",
-        hovertemplate='%{text}',
-        text=duration_texts
-    ))
-
-    fig.add_trace(go.Scatter(
-        x=powers,
-        y=tss,
-        name="TSS",
-        yaxis="y3",
-        hovertemplate='%{y:.1f}'
-    ))
-
-    fig.add_vrect(x0=math.ceil(ftp * 0.56), x1=math.ceil(ftp * 0.75),
-                  annotation_text="Zone 2", annotation_position="top left",
-                  fillcolor="blue", opacity=0.25, line_width=0)
-    fig.add_vrect(x0=math.ceil(ftp * 0.75), x1=math.ceil(ftp * 0.9),
-                  annotation_text="Zone 3", annotation_position="top left",
-                  fillcolor="green", opacity=0.25, line_width=0)
-    fig.add_vrect(x0=math.ceil(ftp * 0.9), x1=math.ceil(ftp * 1.05),
-                  annotation_text="Zone 4", annotation_position="top left",
-                  fillcolor="orange", opacity=0.25, line_width=0)
-    fig.add_vrect(x0=math.ceil(ftp * 1.05), x1=math.ceil(ftp * 1.2),
-                  annotation_text="Zone 5", annotation_position="top left",
-                  fillcolor="red", opacity=0.25, line_width=0)
-
-    # Create axis objects
-    fig.update_layout(
-        showlegend=True,
-        hovermode='x unified',
-        spikedistance=-1,
-        xaxis=dict(
-            title="Power(w)",
-            showspikes=True,
-            spikemode='across',
-            spikesnap='cursor',
-            showline=True,
-            showgrid=True,
+    powers, speeds = _cached_speed_sweep(math.ceil(0.4 * ftp),
+                                         math.ceil(1.3 * ftp),
+                                         params.as_tuple())
+    durations = np.divide(race_distance, speeds)
+
+    # tss = (powers / ftp)**2 * durations * 100, computed in place in a
+    # single buffer instead of one temporary per operator.
+    tss = np.multiply(powers, powers)
+    tss /= ftp * ftp
+    tss *= durations
+    tss *= 100.0
+
+    # Split whole seconds into h:mm:ss with integer divmods instead of
+    # repeated float floor/subtract round-trips. Infeasible points carry
+    # NaN durations and get an empty label.
+    finite = np.isfinite(durations)
+    total_seconds = np.where(finite, durations * 3600, 0.0).astype(np.int64)
+    hours, remainder = np.divmod(total_seconds, 3600)
+    minutes, seconds = np.divmod(remainder, 60)
+    duration_texts = [f"{h}:{m:02d}:{s:02d}" if ok else ""
+                      for h, m, s, ok in zip(hours.tolist(), minutes.tolist(),
+                                             seconds.tolist(),
+                                             finite.tolist())]
+
+    # Scattergl renders through WebGL, and float32 arrays let plotly
+    # serialize the data as typed buffers instead of JSON number lists.
+    powers_f32 = powers.astype(np.float32)
+    fig = go.Figure(data=[
+        go.Scattergl(
+            x=powers_f32,
+            y=speeds.astype(np.float32),
+            name="Speed",
+            hovertemplate='%{y:.2f} km/h'
         ),
-        yaxis=dict(
-            title="Speed(km/h)",
-            titlefont=dict(
-                color="#1f77b4"
-            ),
-            tickfont=dict(
-                color="#1f77b4"
-            ),
+        go.Scattergl(
+            x=powers_f32,
+            y=durations.astype(np.float32),
+            name="Duration",
+            yaxis="y2",
+            hovertemplate='%{text}',
+            text=duration_texts
         ),
-        yaxis2=dict(
-            title="Duration(h)",
-            titlefont=dict(
-                color="#ff7f0e"
-            ),
-            tickfont=dict(
-                color="#ff7f0e"
-            ),
-            anchor="free",
-            overlaying="y",
-            side="left",
-            position=0.1
+        go.Scattergl(
+            x=powers_f32,
+            y=tss.astype(np.float32),
+            name="TSS",
+            yaxis="y3",
+            hovertemplate='%{y:.1f}'
         ),
-        yaxis3=dict(
-            title="TSS",
-            titlefont=dict(
-                color="#d62728"
-            ),
-            tickfont=dict(
-                color="#d62728"
-            ),
-            anchor="x",
-            overlaying="y",
-            side="right"
-        )
-    )
+    ], layout=_BASE_LAYOUT)
 
-    # Update layout properties
+    # Only the zone rectangles depend on an input (ftp), so they are the
+    # one piece of layout written per callback. Each edge is computed
+    # exactly once and shared by the rectangle on either side of it.
+    zone_edges = [math.ceil(ftp * frac) for frac in _ZONE_FRACTIONS]
     fig.update_layout(
-        title_text="Race Performance Calculator",
-        width=1000,
-        height=800
-    )
+        shapes=[dict(type='rect', xref='x', yref='y domain', y0=0, y1=1,
+                     x0=zone_edges[i], x1=zone_edges[i + 1],
+                     fillcolor=color, opacity=0.25, line_width=0)
+                for i, (_, color) in enumerate(_ZONES)],
+        annotations=[dict(text=name, x=zone_edges[i], y=1,
+                          xref='x', yref='y domain', xanchor='left',
+                          yanchor='top', showarrow=False)
+                     for i, (name, _) in enumerate(_ZONES)])
 
     return fig
 